@@ -1,3 +1,7 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -6,8 +10,21 @@ from slowapi.errors import RateLimitExceeded
 from app.config import ALLOWED_ORIGINS
 from app.limiter import limiter
 from app.routers import upload, query, repos
+from app.services.chunker import POOL_CONTEXT
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One chunker process pool for the app's lifetime, so uploads don't
+    # pay worker start-up on every request
+    app.state.chunk_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=POOL_CONTEXT,
+    )
+    yield
+    app.state.chunk_pool.shutdown(wait=False, cancel_futures=True)
+
 
-app = FastAPI(title="RepoPilot", version="0.1.0")
+app = FastAPI(title="RepoPilot", version="0.1.0", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(
     RateLimitExceeded,
@@ -1,8 +1,9 @@
 """Router for querying indexed repositories."""
 
-import json
+import asyncio
 import logging
 
+import orjson
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -16,6 +17,10 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+SSE_DONE = SSE_PREFIX + b'{"type":"done"}' + SSE_SUFFIX
+
 
 class QueryRequest(BaseModel):
     repo_id: str
@@ -47,9 +52,12 @@ async def query_repo(request: Request, body: QueryRequest):
 
     query_embedding = embeddings[0]
 
-    # 3. Retrieve relevant chunks
+    # 3. Retrieve relevant chunks. Off the event loop: a repo's first
+    # query loads its whole in-memory index from ChromaDB.
     try:
-        chunks = query_chunks(body.repo_id, query_embedding, top_k=8)
+        chunks = await asyncio.to_thread(
+            query_chunks, body.repo_id, query_embedding, top_k=8,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=502,
@@ -64,7 +72,7 @@ async def query_repo(request: Request, body: QueryRequest):
 
     # 3. Stream the response as SSE
     return StreamingResponse(
-        _sse_generator(body.question, chunks),
+        _sse_generator(body.question, chunks, _sources_event(chunks)),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -73,9 +81,13 @@ async def query_repo(request: Request, body: QueryRequest):
     )
 
 
-async def _sse_generator(question: str, chunks: list[dict]):
-    """Yield SSE-formatted events: sources, tokens, done."""
-    # First event: source chunks with content for collapsible display
+def _sse_event(payload: dict) -> bytes:
+    """Encode *payload* as a single SSE data frame."""
+    return SSE_PREFIX + orjson.dumps(payload) + SSE_SUFFIX
+
+
+def _sources_event(chunks: list[dict]) -> bytes:
+    """Build the first SSE event: source chunks for collapsible display."""
     sources = [
         {
             "filename": c["filename"],
@@ -86,14 +98,19 @@ async def _sse_generator(question: str, chunks: list[dict]):
         }
         for c in chunks
     ]
-    yield f"data: {json.dumps({'type': 'sources', 'chunks': sources})}\n\n"
+    return _sse_event({"type": "sources", "chunks": sources})
+
+
+async def _sse_generator(question: str, chunks: list[dict], sources: bytes):
+    """Yield SSE-formatted events: sources, tokens, done."""
+    yield sources
 
     # Stream tokens from Claude
     try:
         async for token in stream_response(question, chunks):
-            yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+            yield _sse_event({"type": "token", "content": token})
     except RuntimeError as e:
-        yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+        yield _sse_event({"type": "error", "message": str(e)})
 
     # Final event
-    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    yield SSE_DONE
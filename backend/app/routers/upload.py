@@ -1,21 +1,34 @@
 """Router for repository upload and indexing."""
 
+import asyncio
 import logging
 import uuid
+from concurrent.futures import Executor
 
+import numpy as np
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 
 from app.services.github import clone_repo, cleanup_repo
 from app.limiter import limiter
-from app.services.chunker import chunk_repository
-from app.services.embedder import embed_texts
-from app.services.vectorstore import store_chunks
+from app.services.chunker import chunk_repository_streaming
+from app.services.embedder import EMBEDDING_MODEL, embed_texts
+from app.services.embedding_cache import (
+    content_hash, get_embeddings, put_embeddings,
+)
+from app.services.vectorstore import (
+    delete_repo, repo_exists, set_file_count, store_chunks,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Concurrent embedding tasks draining the chunk queue
+EMBED_WORKERS = 4
+# Max batches buffered between pipeline stages
+QUEUE_MAXSIZE = 4
+
 
 class UploadRequest(BaseModel):
     github_url: str
@@ -34,7 +47,7 @@ class UploadResponse(BaseModel):
 async def upload_repo(request: Request, body: UploadRequest):
     """Clone a GitHub repo, chunk its code, embed, and store in ChromaDB.
 
-    Full pipeline: clone → chunk → embed → store → cleanup.
+    Full pipeline: clone → (chunk ‖ embed ‖ store) → cleanup.
     """
     repo_path: str | None = None
 
@@ -44,29 +57,25 @@ async def upload_repo(request: Request, body: UploadRequest):
         repo_name = repo_path.split("/")[-1]
         repo_id = f"{repo_name}-{uuid.uuid4().hex[:8]}"
 
-        # 2. Chunk
-        chunks = chunk_repository(repo_path, repo_id)
-        if not chunks:
+        # 2. Chunk, embed and store as an overlapping pipeline
+        # Shared chunker pool from app startup (absent when lifespan
+        # events don't run, e.g. under ASGITransport in tests)
+        pool = getattr(request.app.state, "chunk_pool", None)
+        files_processed, chunks_created = await _index_repository(
+            repo_path, repo_id, pool,
+        )
+        if not chunks_created:
             raise HTTPException(
                 status_code=400,
                 detail="No code files found in repository.",
             )
 
-        # 3. Embed
-        texts = [c["content"] for c in chunks]
-        embeddings = await embed_texts(texts)
-
-        # 4. Store
-        store_chunks(repo_id, chunks, embeddings)
-
-        # 5. Compute stats
-        unique_files = {c["filename"] for c in chunks}
-
-        return UploadResponse(
+        # Every field comes from our own pipeline — skip re-validation
+        return UploadResponse.model_construct(
             repo_id=repo_id,
             repo_name=repo_name,
-            files_processed=len(unique_files),
-            chunks_created=len(chunks),
+            files_processed=files_processed,
+            chunks_created=chunks_created,
             status="indexed",
         )
 
@@ -82,4 +91,101 @@ async def upload_repo(request: Request, body: UploadRequest):
         raise HTTPException(status_code=500, detail=str(e)) from e
     finally:
         if repo_path:
-            cleanup_repo(repo_path)
+            await asyncio.to_thread(cleanup_repo, repo_path)
+
+
+async def _index_repository(
+    repo_path: str, repo_id: str, pool: Executor | None = None,
+) -> tuple[int, int]:
+    """Chunk, embed and store a repository with the stages overlapped.
+
+    A producer streams chunk batches from the chunker (in a worker thread),
+    EMBED_WORKERS tasks embed them concurrently, and a single writer stores
+    the results, so CPU-bound chunking overlaps network-bound embedding.
+    If any stage fails, the partially stored collection is removed.
+
+    Blocking ChromaDB, SQLite and filesystem calls run in worker threads so
+    a large upload doesn't stall other requests on the event loop.
+
+    Returns:
+        (files_processed, chunks_created)
+    """
+    chunk_queue: asyncio.Queue[list[dict] | None] = asyncio.Queue(QUEUE_MAXSIZE)
+    store_queue: asyncio.Queue[tuple[list[dict], np.ndarray] | None] = asyncio.Queue(
+        QUEUE_MAXSIZE,
+    )
+
+    async def produce() -> None:
+        batches = chunk_repository_streaming(repo_path, repo_id, pool=pool)
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            await chunk_queue.put(batch)
+        for _ in range(EMBED_WORKERS):
+            await chunk_queue.put(None)
+
+    async def embed_worker() -> None:
+        while (batch := await chunk_queue.get()) is not None:
+            embeddings = await _embed_with_cache([c["content"] for c in batch])
+            await store_queue.put((batch, embeddings))
+
+    async def embed() -> None:
+        await _gather_or_cancel(*(embed_worker() for _ in range(EMBED_WORKERS)))
+        await store_queue.put(None)
+
+    async def store() -> tuple[int, int]:
+        files: set[str] = set()
+        count = 0
+        while (item := await store_queue.get()) is not None:
+            batch, embeddings = item
+            await asyncio.to_thread(store_chunks, repo_id, batch, embeddings)
+            files.update(c["filename"] for c in batch)
+            count += len(batch)
+        return len(files), count
+
+    try:
+        _, _, stats = await _gather_or_cancel(produce(), embed(), store())
+        files_processed, chunks_created = stats
+        if chunks_created:
+            await asyncio.to_thread(set_file_count, repo_id, files_processed)
+    except BaseException:
+        await asyncio.to_thread(_discard_repo, repo_id)
+        raise
+
+    return files_processed, chunks_created
+
+
+def _discard_repo(repo_id: str) -> None:
+    """Delete a partially indexed repository, if anything was stored."""
+    if repo_exists(repo_id):
+        delete_repo(repo_id)
+
+
+async def _gather_or_cancel(*coros):
+    """Run *coros* concurrently; if one fails, cancel the rest and re-raise."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def _embed_with_cache(texts: list[str]) -> np.ndarray:
+    """Embed *texts*, reusing cached vectors for content seen before."""
+    hashes = [content_hash(t) for t in texts]
+    cached = await asyncio.to_thread(get_embeddings, hashes, EMBEDDING_MODEL)
+
+    missing = [i for i, h in enumerate(hashes) if h not in cached]
+    if missing:
+        fresh = await embed_texts([texts[i] for i in missing])
+        missing_hashes = [hashes[i] for i in missing]
+        await asyncio.to_thread(
+            put_embeddings, missing_hashes, fresh, EMBEDDING_MODEL,
+        )
+        cached.update(zip(missing_hashes, fresh))
+
+    logger.info(
+        "Embedding cache: %d hits, %d misses",
+        len(texts) - len(missing), len(missing),
+    )
+    return np.asarray([cached[h] for h in hashes], dtype=np.float32)
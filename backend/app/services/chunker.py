@@ -5,9 +5,18 @@ code files, and splits them into semantically meaningful chunks that
 preserve function/class boundaries where possible.
 """
 
+import multiprocessing
 import os
 import re
-from pathlib import Path
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor
+from itertools import accumulate
+
+try:
+    import hyperscan
+except ImportError:  # optional (requirements-optional.txt) — fall back to re
+    hyperscan = None
 
 # ---------------------------------------------------------------------------
 # File filtering config
@@ -22,20 +31,15 @@ SKIP_DIRS = {
 MAX_FILE_SIZE = 500 * 1024  # 500 KB — skip anything larger
 MINIFIED_LINE_THRESHOLD = 10_000  # single line over this → likely minified
 
+# Minified bundles — skipped by name without reading them
+MIN_SUFFIXES = (".min.js", ".min.css")
+
 SKIP_FILES = {
     "package-lock.json", "yarn.lock", "poetry.lock", "pnpm-lock.yaml",
     "Pipfile.lock", "composer.lock", "Gemfile.lock", "Cargo.lock",
 }
 
-ALLOWED_EXTENSIONS = {
-    ".py", ".js", ".ts", ".tsx", ".jsx",
-    ".java", ".go", ".rs", ".cpp", ".c", ".h",
-    ".css", ".html", ".md",
-    ".json", ".yaml", ".yml",
-    ".sql", ".sh",
-}
-
-# Map file extension → language name
+# Map file extension → language name. Only these extensions are indexed.
 EXTENSION_TO_LANGUAGE = {
     ".py": "python",
     ".js": "javascript", ".jsx": "javascript",
@@ -49,12 +53,19 @@ EXTENSION_TO_LANGUAGE = {
     ".sql": "sql", ".sh": "shell",
 }
 
+ALLOWED_EXTENSIONS = frozenset(EXTENSION_TO_LANGUAGE)
+
 # ---------------------------------------------------------------------------
 # Regex patterns for top-level definitions by language
 # ---------------------------------------------------------------------------
 
 # Each pattern matches the *start* of a top-level definition line.
 # We anchor on zero indentation (^) so we only split at top-level scope.
+# Patterns run over the whole file, so whitespace inside a pattern is
+# [ \t] — a bare \s would let a match (and its backtracking) run across
+# lines. A trailing \s may still match the line's own newline. Where a
+# whitespace run precedes a name, a single [ \t] suffices (the run before
+# it absorbs the rest) and keeps backtracking over long runs linear.
 SPLIT_PATTERNS: dict[str, re.Pattern] = {
     "python": re.compile(
         r"^(?:def |class |async def )", re.MULTILINE,
@@ -62,45 +73,78 @@ SPLIT_PATTERNS: dict[str, re.Pattern] = {
     "javascript": re.compile(
         r"^(?:"
         r"function\s|"                        # function foo(
-        r"(?:export\s+)?(?:default\s+)?function\s|"
-        r"(?:const|let|var)\s+\w+\s*=\s*(?:\(|async)|"  # const foo = ( / async
-        r"(?:export\s+)?class\s"
+        r"(?:export[ \t]+)?(?:default[ \t]+)?function\s|"
+        r"(?:const|let|var)[ \t]+\w+[ \t]*=[ \t]*(?:\(|async)|"  # const foo = ( / async
+        r"(?:export[ \t]+)?class\s"
         r")", re.MULTILINE,
     ),
     "typescript": re.compile(
         r"^(?:"
         r"function\s|"
-        r"(?:export\s+)?(?:default\s+)?function\s|"
-        r"(?:const|let|var)\s+\w+\s*=\s*(?:\(|async)|"
-        r"(?:export\s+)?(?:class|interface|type|enum)\s"
+        r"(?:export[ \t]+)?(?:default[ \t]+)?function\s|"
+        r"(?:const|let|var)[ \t]+\w+[ \t]*=[ \t]*(?:\(|async)|"
+        r"(?:export[ \t]+)?(?:class|interface|type|enum)\s"
         r")", re.MULTILINE,
     ),
+    # Modifiers and whitespace, ending in whitespace. Each repetition is
+    # "modifiers, then one blank", so there is only one way to match a
+    # whitespace run and backtracking stays linear.
     "java": re.compile(
         r"^(?:"
-        r"(?:public|private|protected|static|\s)*\s+class\s|"
-        r"(?:public|private|protected|static|\s)*\s+\w+\s+\w+\s*\("  # methods
+        r"(?:(?:public|private|protected|static)*[ \t])+class\s|"
+        r"(?:(?:public|private|protected|static)*[ \t])+\w+[ \t]+\w+[ \t]*\("  # methods
         r")", re.MULTILINE,
     ),
     "go": re.compile(
         r"^(?:func |type )", re.MULTILINE,
     ),
     "rust": re.compile(
-        r"^(?:pub\s+)?(?:fn |struct |enum |impl |trait |mod )", re.MULTILINE,
+        r"^(?:pub[ \t]+)?(?:fn |struct |enum |impl |trait |mod )", re.MULTILINE,
     ),
     "cpp": re.compile(
         r"^(?:"
         r"(?:class|struct|namespace)\s|"
-        r"\w[\w\s\*&:<>]*\s+\w+\s*\("  # function definitions
+        r"\w[\w \t\*&:<>]*[ \t]\w+[ \t]*\("  # function definitions
         r")", re.MULTILINE,
     ),
     "c": re.compile(
         r"^(?:"
         r"(?:struct|typedef)\s|"
-        r"\w[\w\s\*]*\s+\w+\s*\("
+        r"\w[\w \t\*]*[ \t]\w+[ \t]*\("
         r")", re.MULTILINE,
     ),
 }
 
+
+def _compile_hyperscan_databases() -> dict:
+    """Compile each SPLIT_PATTERNS entry into a Hyperscan block-mode database.
+
+    Languages whose pattern Hyperscan rejects are left out and keep using
+    the re engine.
+    """
+    databases = {}
+    for language, pattern in SPLIT_PATTERNS.items():
+        db = hyperscan.Database()
+        try:
+            db.compile(
+                expressions=[pattern.pattern.encode()],
+                ids=[0],
+                elements=1,
+                # SOM_LEFTMOST reports where each match starts, which is the
+                # line we split on. No SINGLEMATCH: we want every definition.
+                flags=[hyperscan.HS_FLAG_MULTILINE | hyperscan.HS_FLAG_SOM_LEFTMOST],
+            )
+        except hyperscan.error:
+            continue
+        databases[language] = db
+    return databases
+
+
+HYPERSCAN_DATABASES = _compile_hyperscan_databases() if hyperscan else {}
+
+# Any non-whitespace character (used to drop blank preambles)
+_NON_BLANK = re.compile(r"\S")
+
 # Threshold: files under this many lines become a single chunk
 SMALL_FILE_THRESHOLD = 80
 
@@ -111,211 +155,330 @@ FALLBACK_OVERLAP_LINES = 10
 # Safety net: max characters per chunk (~1500 tokens for embedding model)
 MAX_CHUNK_CHARS = 6000
 
+# Repos with fewer files than this are chunked in-process
+PARALLEL_MIN_FILES = 64
+
+# Chunks per batch yielded by chunk_repository_streaming
+STREAM_BATCH_SIZE = 256
+
+# Start method for chunker process pools. Pools start workers lazily from
+# whichever thread first maps onto them, and fork()ing a multi-threaded
+# process can deadlock on locks held at fork time; a fork server forks
+# from a clean single-threaded process instead. Like spawn, it re-imports
+# the caller's __main__ in workers, so scripts that create such a pool
+# need an `if __name__ == "__main__":` guard.
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver"
+    if "forkserver" in multiprocessing.get_all_start_methods()
+    else "spawn"
+)
+
 
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def chunk_repository(repo_path: str, repo_id: str) -> list[dict]:
+def chunk_repository(
+    repo_path: str, repo_id: str, pool: Executor | None = None,
+) -> list[dict]:
     """Walk a repository and split every code file into chunks.
 
+    Files are independent, so when the caller passes a process pool,
+    larger repositories are chunked across it.
+
     Args:
         repo_path: Absolute path to the cloned repository on disk.
         repo_id: UUID string identifying this repository.
+        pool: Long-lived process pool to chunk on (see POOL_CONTEXT).
+            If omitted, files are chunked in this process; no pool is
+            started implicitly.
 
     Returns:
         List of chunk dicts, each containing:
             content, filename, start_line, end_line, language, chunk_id
     """
-    repo_root = Path(repo_path)
     chunks: list[dict] = []
+    for batch in chunk_repository_streaming(repo_path, repo_id, pool=pool):
+        chunks.extend(batch)
+    return chunks
 
-    for file_path in _iter_code_files(repo_root):
-        rel_path = str(file_path.relative_to(repo_root))
-        language = EXTENSION_TO_LANGUAGE.get(file_path.suffix, "plaintext")
 
-        try:
-            text = file_path.read_text(encoding="utf-8", errors="replace")
-        except (OSError, UnicodeDecodeError):
-            continue
-
-        lines = text.splitlines(keepends=True)
-        if not lines:
-            continue
+def chunk_repository_streaming(
+    repo_path: str,
+    repo_id: str,
+    batch_size: int = STREAM_BATCH_SIZE,
+    pool: Executor | None = None,
+) -> Iterator[list[dict]]:
+    """Like chunk_repository, but yield chunks in batches as files finish.
 
-        # Skip minified files (single line over 10k chars)
-        if any(len(line) > MINIFIED_LINE_THRESHOLD for line in lines[:3]):
-            continue
-
-        file_chunks = _chunk_file(lines, language)
+    Lets callers start embedding before the whole repository is chunked.
+    Batches hold whole files, so one may run slightly over *batch_size*.
+    """
+    prefix_len = len(os.path.join(repo_path, ""))
+    jobs = [
+        (file_path, file_path[prefix_len:], language, repo_id)
+        for file_path, language in _iter_code_files(repo_path)
+    ]
 
-        # Safety net: re-split any chunk that exceeds MAX_CHUNK_CHARS
-        file_chunks = _enforce_max_size(lines, file_chunks)
+    # Small repos: dispatching to workers would cost more than it saves
+    if pool is None or len(jobs) < PARALLEL_MIN_FILES:
+        yield from _batched(map(_chunk_one_file, jobs), batch_size)
+        return
 
-        for start, end, content in file_chunks:
-            chunk_id = f"{repo_id}:{rel_path}:{start}"
-            chunks.append({
-                "content": content,
-                "filename": rel_path,
-                "start_line": start,
-                "end_line": end,
-                "language": language,
-                "chunk_id": chunk_id,
-            })
-
-    return chunks
+    per_file = pool.map(_chunk_one_file, jobs, chunksize=16)
+    yield from _batched(per_file, batch_size)
 
 
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _iter_code_files(root: Path):
-    """Yield Path objects for every code file we should process."""
-    for dirpath, dirnames, filenames in os.walk(root):
-        # Prune skipped directories in-place so os.walk doesn't descend
-        dirnames[:] = [
-            d for d in dirnames if d not in SKIP_DIRS
-        ]
-
-        for fname in filenames:
-            if fname in SKIP_FILES:
-                continue
-            if fname.endswith(".min.js") or fname.endswith(".min.css"):
-                continue
-            if fname.endswith(".map"):
-                continue
-
-            fpath = Path(dirpath) / fname
-            if fpath.suffix not in ALLOWED_EXTENSIONS:
-                continue
-
-            # Skip files over 500 KB
-            try:
-                if fpath.stat().st_size > MAX_FILE_SIZE:
+def _batched(
+    per_file: Iterable[list[dict]], batch_size: int,
+) -> Iterator[list[dict]]:
+    """Group per-file chunk lists into batches of at least *batch_size*."""
+    batch: list[dict] = []
+    for file_chunks in per_file:
+        batch.extend(file_chunks)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _chunk_one_file(job: tuple[str, str, str, str]) -> list[dict]:
+    """Read and chunk a single file.
+
+    Takes a picklable (file_path, rel_path, language, repo_id) tuple so it
+    can run inside a process-pool worker.
+    """
+    file_path, rel_path, language, repo_id = job
+
+    try:
+        with open(file_path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError):
+        return []
+
+    # Offset of the start of each line (plus end of file). Chunks are
+    # sliced straight out of *text* with these, never re-joined from lines.
+    line_starts = list(
+        accumulate(map(len, text.splitlines(keepends=True)), initial=0),
+    )
+    num_lines = len(line_starts) - 1
+    if not num_lines:
+        return []
+
+    # Skip minified files (single line over 10k chars)
+    if any(
+        line_starts[i + 1] - line_starts[i] > MINIFIED_LINE_THRESHOLD
+        for i in range(min(3, num_lines))
+    ):
+        return []
+
+    spans = _chunk_file(text, line_starts, language)
+
+    # Safety net: re-split any chunk that exceeds MAX_CHUNK_CHARS
+    spans = _enforce_max_size(line_starts, spans)
+
+    return [
+        {
+            "content": text[start_off:end_off],
+            "filename": rel_path,
+            "start_line": start,
+            "end_line": end,
+            "language": language,
+            "chunk_id": f"{repo_id}:{rel_path}:{start}",
+        }
+        for start, end, start_off, end_off in spans
+    ]
+
+
+def _iter_code_files(root: str) -> Iterator[tuple[str, str]]:
+    """Yield (path, language) for every code file we should process.
+
+    Uses an explicit stack over os.scandir so directory entries' cached
+    type information spares a stat() per entry.
+    """
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                name = entry.name
+                # Don't follow directory symlinks (matches os.walk's default)
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                    continue
+
+                if name in SKIP_FILES:
+                    continue
+                if name.endswith(MIN_SUFFIXES):
+                    continue
+                if name.endswith(".map"):
                     continue
-            except OSError:
-                continue
 
-            yield fpath
+                # Same rule as Path.suffix: dotfiles have no suffix.
+                # One dict lookup both filters and picks the language.
+                dot = name.rfind(".")
+                if dot <= 0:
+                    continue
+                language = EXTENSION_TO_LANGUAGE.get(name[dot:])
+                if language is None:
+                    continue
+
+                # Skip files over 500 KB (and anything that isn't a file)
+                try:
+                    if not entry.is_file():
+                        continue
+                    if entry.stat().st_size > MAX_FILE_SIZE:
+                        continue
+                except OSError:
+                    continue
+
+                yield entry.path, language
 
 
 def _chunk_file(
-    lines: list[str], language: str,
-) -> list[tuple[int, int, str]]:
-    """Split a file's lines into chunks.
+    text: str, line_starts: list[int], language: str,
+) -> list[tuple[int, int, int, int]]:
+    """Split a file into chunk spans.
 
-    Returns a list of (start_line, end_line, content) tuples.
-    Line numbers are 1-indexed.
+    Returns a list of (start_line, end_line, start_offset, end_offset)
+    tuples. Line numbers are 1-indexed; offsets index into *text*.
     """
-    if len(lines) < SMALL_FILE_THRESHOLD:
-        return [(1, len(lines), "".join(lines))]
+    num_lines = len(line_starts) - 1
+    if num_lines < SMALL_FILE_THRESHOLD:
+        return [_span(line_starts, 0, num_lines)]
 
     # Try regex-based splitting first
-    pattern = SPLIT_PATTERNS.get(language)
-    if pattern is not None:
-        chunks = _split_by_definitions(lines, pattern)
+    if language in SPLIT_PATTERNS:
+        chunks = _split_by_definitions(text, line_starts, language)
         if len(chunks) > 1:
             return chunks
 
     # Fallback: fixed-size windows with overlap
-    return _split_by_lines(lines, FALLBACK_CHUNK_LINES, FALLBACK_OVERLAP_LINES)
+    return _split_by_lines(
+        line_starts, 0, num_lines, FALLBACK_CHUNK_LINES, FALLBACK_OVERLAP_LINES,
+    )
 
 
 def _split_by_definitions(
-    lines: list[str], pattern: re.Pattern,
-) -> list[tuple[int, int, str]]:
-    """Split on top-level definitions found by *pattern*.
+    text: str, line_starts: list[int], language: str,
+) -> list[tuple[int, int, int, int]]:
+    """Split on top-level definitions found by the *language* split pattern.
 
     Each definition and its body (up to the next definition) becomes one
     chunk. Any preamble (imports, module docstring) before the first
     definition becomes its own chunk.
     """
-    # Find 0-indexed line numbers where definitions start
+    # Find 0-indexed line numbers where definitions start, scanning the
+    # whole buffer once rather than matching line by line
+    db = HYPERSCAN_DATABASES.get(language)
+    if db is not None:
+        offsets = _scan_definitions(db, text)
+    else:
+        offsets = [m.start() for m in SPLIT_PATTERNS[language].finditer(text)]
+
     split_indices: list[int] = []
-    for i, line in enumerate(lines):
-        if pattern.match(line):
-            split_indices.append(i)
+    for offset in offsets:
+        line_no = bisect_right(line_starts, offset) - 1
+        if not split_indices or split_indices[-1] != line_no:
+            split_indices.append(line_no)
 
     if not split_indices:
         return []
 
-    chunks: list[tuple[int, int, str]] = []
+    chunks: list[tuple[int, int, int, int]] = []
 
-    # Preamble: everything before the first definition
-    if split_indices[0] > 0:
-        preamble = lines[: split_indices[0]]
-        # Only keep preamble if it has non-blank content
-        if any(l.strip() for l in preamble):
-            chunks.append((
-                1,
-                split_indices[0],
-                "".join(preamble),
-            ))
+    # Preamble: everything before the first definition.
+    # Only keep it if it has non-blank content.
+    if split_indices[0] > 0 and _NON_BLANK.search(
+        text, 0, line_starts[split_indices[0]],
+    ):
+        chunks.append(_span(line_starts, 0, split_indices[0]))
 
     # Each definition → next definition (or EOF)
+    num_lines = len(line_starts) - 1
     for idx, start in enumerate(split_indices):
-        end = split_indices[idx + 1] if idx + 1 < len(split_indices) else len(lines)
-        chunk_lines = lines[start:end]
-        chunks.append((
-            start + 1,   # 1-indexed
-            end,
-            "".join(chunk_lines),
-        ))
+        end = split_indices[idx + 1] if idx + 1 < len(split_indices) else num_lines
+        chunks.append(_span(line_starts, start, end))
 
     return chunks
 
 
-def _split_by_lines(
-    lines: list[str], chunk_size: int, overlap: int,
-) -> list[tuple[int, int, str]]:
-    """Fall back to fixed-size windows with overlap."""
-    chunks: list[tuple[int, int, str]] = []
-    total = len(lines)
-    start = 0
-
-    while start < total:
-        end = min(start + chunk_size, total)
-        chunk_lines = lines[start:end]
-        chunks.append((
-            start + 1,   # 1-indexed
-            end,
-            "".join(chunk_lines),
-        ))
-        # Advance by (chunk_size - overlap), but always make progress
-        start += max(chunk_size - overlap, 1)
+def _scan_definitions(db, text: str) -> list[int]:
+    """Scan the whole file once with Hyperscan and return match offsets.
 
-    return chunks
+    Hyperscan reports byte offsets into the UTF-8 buffer; these are mapped
+    back to sorted character offsets into *text*.
+    """
+    data = text.encode("utf-8")
+    starts: set[int] = set()
+
+    def on_match(_id, start, _end, _flags, _context):
+        starts.add(start)
+
+    db.scan(data, match_event_handler=on_match)
+
+    offsets: list[int] = []
+    prev_byte = prev_char = 0
+    for byte_off in sorted(starts):
+        # Matches begin at line starts, so every slice is valid UTF-8
+        prev_char += len(data[prev_byte:byte_off].decode("utf-8"))
+        prev_byte = byte_off
+        offsets.append(prev_char)
+
+    return offsets
+
+
+def _split_by_lines(
+    line_starts: list[int], first: int, last: int, chunk_size: int, overlap: int,
+) -> list[tuple[int, int, int, int]]:
+    """Fall back to fixed-size windows with overlap over lines [first, last)."""
+    # Advance by (chunk_size - overlap), but always make progress
+    step = max(chunk_size - overlap, 1)
+    return [
+        _span(line_starts, start, min(start + chunk_size, last))
+        for start in range(first, last, step)
+    ]
 
 
 def _enforce_max_size(
-    all_lines: list[str],
-    chunks: list[tuple[int, int, str]],
-) -> list[tuple[int, int, str]]:
+    line_starts: list[int],
+    chunks: list[tuple[int, int, int, int]],
+) -> list[tuple[int, int, int, int]]:
     """Re-split any chunk whose content exceeds MAX_CHUNK_CHARS.
 
     This is a safety net that catches oversized functions/classes the
     regex splitter kept as a single chunk.
     """
-    result: list[tuple[int, int, str]] = []
+    result: list[tuple[int, int, int, int]] = []
 
-    for start, end, content in chunks:
-        if len(content) <= MAX_CHUNK_CHARS:
-            result.append((start, end, content))
+    for chunk in chunks:
+        start, end, start_off, end_off = chunk
+        if end_off - start_off <= MAX_CHUNK_CHARS:
+            result.append(chunk)
             continue
 
         # Re-split this oversized chunk using line-based windowing.
-        # start/end are 1-indexed; all_lines is 0-indexed.
-        chunk_lines = all_lines[start - 1 : end]
-        sub_chunks = _split_by_lines(
-            chunk_lines, FALLBACK_CHUNK_LINES, FALLBACK_OVERLAP_LINES,
-        )
-        # Adjust line numbers back to file-level offsets
-        for sub_start, sub_end, sub_content in sub_chunks:
-            result.append((
-                start + sub_start - 1,  # re-anchor to file
-                start + sub_end - 1,
-                sub_content,
-            ))
+        # start/end are 1-indexed; line_starts is 0-indexed.
+        result.extend(_split_by_lines(
+            line_starts, start - 1, end,
+            FALLBACK_CHUNK_LINES, FALLBACK_OVERLAP_LINES,
+        ))
 
     return result
+
+
+def _span(
+    line_starts: list[int], first: int, last: int,
+) -> tuple[int, int, int, int]:
+    """Build a chunk span for 0-indexed lines [first, last)."""
+    return (first + 1, last, line_starts[first], line_starts[last])
@@ -1,8 +1,14 @@
 """Service for generating embeddings via OpenAI's text-embedding-3-small."""
 
+import asyncio
 import logging
+import weakref
 
-from openai import AsyncOpenAI, APIError, RateLimitError
+import httpx
+import numpy as np
+from openai import (
+    AsyncOpenAI, APIError, DefaultAsyncHttpxClient, RateLimitError,
+)
 
 from app.config import OPENAI_API_KEY
 
@@ -13,46 +19,94 @@ MAX_BATCH_SIZE = 100  # Keep batches well under OpenAI's 300k token/request limi
 MAX_TOKEN_ESTIMATE = 8000  # text-embedding-3-small limit is 8192 tokens
 MAX_CHARS = MAX_TOKEN_ESTIMATE * 3  # ~3 chars per token conservative estimate
 
-_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-
-
-async def embed_texts(texts: list[str]) -> list[list[float]]:
+MAX_CONNECTIONS = 32  # Shared pool size, also caps in-flight batches
+
+# One HTTP/2 pool for all embedding calls, so concurrent batches are
+# multiplexed instead of queueing behind a small HTTP/1.1 pool
+_client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+        ),
+        timeout=60.0,
+    ),
+)
+
+
+# Event loop → semaphore capping in-flight batches across all embed_texts
+# calls on that loop (asyncio primitives can't be shared between loops)
+_batch_semaphores: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, asyncio.Semaphore
+] = weakref.WeakKeyDictionary()
+
+
+async def embed_texts(
+    texts: list[str],
+    semaphore: asyncio.Semaphore | None = None,
+) -> np.ndarray:
     """Generate embeddings for a list of text strings.
 
     Automatically batches requests to stay within OpenAI's token-per-request
-    limit. Returns vectors in the same order as the input texts.
+    limit and sends the batches concurrently. Returns vectors in the same
+    order as the input texts.
 
     Args:
         texts: List of text strings to embed.
+        semaphore: Caps batches in flight, shared with every other call
+            given the same semaphore. Defaults to one shared by all calls
+            on the running event loop, sized to the HTTP pool
+            (MAX_CONNECTIONS).
 
     Returns:
-        List of embedding vectors (each a list of floats).
+        float32 array of shape (len(texts), dims), one L2-normalized row
+        per text.
 
     Raises:
         RuntimeError: If the OpenAI API call fails after retries.
     """
     if not texts:
-        return []
+        return np.empty((0, 0), dtype=np.float32)
 
     texts = _truncate_oversized(texts)
 
-    all_embeddings: list[list[float]] = []
+    if semaphore is None:
+        semaphore = _default_semaphore()
+
+    async def embed_batch(batch: list[str]) -> np.ndarray:
+        async with semaphore:
+            return await _embed_batch(batch)
+
+    # gather keeps results in batch order
+    all_embeddings = await asyncio.gather(*(
+        embed_batch(texts[batch_start : batch_start + MAX_BATCH_SIZE])
+        for batch_start in range(0, len(texts), MAX_BATCH_SIZE)
+    ))
 
-    for batch_start in range(0, len(texts), MAX_BATCH_SIZE):
-        batch = texts[batch_start : batch_start + MAX_BATCH_SIZE]
-        embeddings = await _embed_batch(batch)
-        all_embeddings.extend(embeddings)
+    embeddings = np.vstack(all_embeddings)
 
-    return all_embeddings
+    # Unit-normalize so cosine similarity downstream is a plain dot product
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.maximum(norms, 1e-12)
+    return embeddings
 
 
-async def _embed_batch(texts: list[str]) -> list[list[float]]:
+def _default_semaphore() -> asyncio.Semaphore:
+    """Return the running loop's shared in-flight batch semaphore."""
+    loop = asyncio.get_running_loop()
+    semaphore = _batch_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _batch_semaphores[loop] = asyncio.Semaphore(MAX_CONNECTIONS)
+    return semaphore
+
+
+async def _embed_batch(texts: list[str]) -> np.ndarray:
     """Embed a single batch (≤100 texts).
 
     Retries once on rate-limit errors with a short backoff.
     """
-    import asyncio
-
     max_retries = 2
     for attempt in range(max_retries):
         try:
@@ -62,7 +116,9 @@ async def _embed_batch(texts: list[str]) -> list[list[float]]:
             )
             # Response items may not be in order — sort by index
             sorted_data = sorted(response.data, key=lambda d: d.index)
-            return [item.embedding for item in sorted_data]
+            return np.asarray(
+                [item.embedding for item in sorted_data], dtype=np.float32,
+            )
 
         except RateLimitError:
             if attempt < max_retries - 1:
@@ -0,0 +1,88 @@
+"""Service for caching embeddings in SQLite, keyed by content hash.
+
+Re-indexing a repository only needs to embed chunks whose content has
+not been seen before with the same embedding model.
+"""
+
+import hashlib
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+
+from app.config import EMBEDDING_CACHE_PATH
+
+# Stay well under SQLite's bound-parameter limit per SELECT
+_LOOKUP_BATCH_SIZE = 500
+
+
+def content_hash(text: str) -> bytes:
+    """Return the SHA-256 digest used as the cache key for *text*."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def get_embeddings(hashes: list[bytes], model: str) -> dict[bytes, np.ndarray]:
+    """Look up cached embeddings.
+
+    Args:
+        hashes: Content hashes from content_hash().
+        model: Embedding model the vectors must have been produced by.
+
+    Returns:
+        Dict mapping each cached hash to its float32 embedding vector.
+        Hashes not in the cache are simply absent.
+    """
+    found: dict[bytes, np.ndarray] = {}
+    unique = list(dict.fromkeys(hashes))
+
+    with closing(_connect()) as conn:
+        for i in range(0, len(unique), _LOOKUP_BATCH_SIZE):
+            batch = unique[i : i + _LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, vec FROM embedding_cache "
+                f"WHERE model = ? AND hash IN ({placeholders})",
+                [model, *batch],
+            )
+            for key, vec in rows:
+                found[key] = np.frombuffer(vec, dtype=np.float32)
+
+    return found
+
+
+def put_embeddings(
+    hashes: list[bytes],
+    embeddings: np.ndarray,
+    model: str,
+) -> None:
+    """Store embeddings in the cache. Existing entries are left untouched.
+
+    Args:
+        hashes: Content hashes from content_hash().
+        embeddings: Corresponding embedding rows (same order as hashes).
+        model: Embedding model that produced the vectors.
+    """
+    rows = [
+        (key, model, np.asarray(vec, dtype=np.float32).tobytes())
+        for key, vec in zip(hashes, embeddings)
+    ]
+
+    with closing(_connect()) as conn, conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO embedding_cache (hash, model, vec) "
+            "VALUES (?, ?, ?)",
+            rows,
+        )
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the cache database, creating the table on first use."""
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embedding_cache ("
+        "hash BLOB NOT NULL, "
+        "model TEXT NOT NULL, "
+        "vec BLOB NOT NULL, "
+        "PRIMARY KEY (hash, model))"
+    )
+    return conn
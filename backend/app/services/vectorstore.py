@@ -1,9 +1,12 @@
 """Service for ChromaDB operations (store, query, list, delete)."""
 
 import logging
+import threading
 from datetime import datetime, timezone
+from typing import NamedTuple
 
 import chromadb
+import numpy as np
 
 from app.config import CHROMA_PERSIST_DIR
 
@@ -11,12 +14,54 @@ logger = logging.getLogger(__name__)
 
 _client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
 
+# repo_id → list_repos entry, for repos whose indexing has finished
+_repo_stats_cache: dict[str, dict] = {}
+
+# Total chunks kept in the in-memory query index across all repos.
+# Each costs ~1.5 KB of int8 codes at 1536 dims, but its document text
+# (up to MAX_CHUNK_CHARS) and metadata dict usually cost more, so the
+# smaller codes don't buy a higher cap. Larger repos are queried via Chroma.
+MAX_CACHED_CHUNKS = 100_000
+
+# HNSW graph parameters for each collection's on-disk index, used by
+# repos too large for the in-memory index (or with in_memory=False)
+HNSW_M = 16
+HNSW_CONSTRUCTION_EF = 64
+HNSW_SEARCH_EF = 100
+
+# Chunks fetched per collection.get() while building an index, so the
+# float64 vectors Chroma returns are never all materialized at once
+_INDEX_LOAD_PAGE_SIZE = 10_000
+
+
+class _RepoIndex(NamedTuple):
+    """In-memory copy of a repo's collection for top-k queries."""
+    codes: np.ndarray  # (N, dims) int8, see quantize_int8
+    scales: np.ndarray  # (N,) float32 per-row dequantization scales
+    documents: list[str]
+    metadatas: list[dict]
+
+
+# repo_id → _RepoIndex, oldest first (insertion order drives eviction)
+_index_cache: dict[str, _RepoIndex] = {}
+
+# repo_id → count of writes/deletes so far. Queries load indexes on worker
+# threads; a load that overlapped a write sees the count change and isn't
+# cached. Guarded, with _index_cache, by _index_lock.
+_index_generation: dict[str, int] = {}
+_index_lock = threading.Lock()
+
 
 def _get_collection(repo_id: str) -> chromadb.Collection:
     """Get or create a ChromaDB collection for a repository."""
     return _client.get_or_create_collection(
         name=repo_id,
-        metadata={"hnsw:space": "cosine"},
+        metadata={
+            "hnsw:space": "cosine",
+            "hnsw:M": HNSW_M,
+            "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": HNSW_SEARCH_EF,
+        },
     )
 
 
@@ -29,7 +74,7 @@ def repo_exists(repo_id: str) -> bool:
 def store_chunks(
     repo_id: str,
     chunks: list[dict],
-    embeddings: list[list[float]],
+    embeddings: np.ndarray,
 ) -> None:
     """Store code chunks and their embeddings in ChromaDB.
 
@@ -39,9 +84,11 @@ def store_chunks(
     Args:
         repo_id: UUID string identifying the repository.
         chunks: List of chunk dicts from chunker.py.
-        embeddings: Corresponding embedding vectors (same order as chunks).
+        embeddings: Corresponding float32 embedding rows (same order as
+            chunks). ChromaDB accepts the array directly.
     """
     collection = _get_collection(repo_id)
+    indexed_at = datetime.now(timezone.utc).isoformat()
 
     # ChromaDB upsert has a practical batch limit — process in groups of 500
     batch_size = 500
@@ -59,28 +106,58 @@ def store_chunks(
                     "start_line": c["start_line"],
                     "end_line": c["end_line"],
                     "language": c["language"],
-                    "indexed_at": datetime.now(timezone.utc).isoformat(),
+                    "indexed_at": indexed_at,
                 }
                 for c in batch_chunks
             ],
         )
 
+    _repo_stats_cache.pop(repo_id, None)
+    _invalidate_index(repo_id)
     logger.info(
         "Stored %d chunks for repo %s", len(chunks), repo_id,
     )
 
 
+def set_file_count(repo_id: str, files: int) -> None:
+    """Record a repository's unique-file count on its collection.
+
+    Called once indexing has finished, so list_repos can report the file
+    count without reading every chunk's metadata.
+
+    Args:
+        repo_id: UUID string identifying the repository.
+        files: Number of unique files indexed.
+    """
+    collection = _client.get_collection(name=repo_id)
+    # Chroma rejects hnsw:* keys on modify; the index config is kept anyway
+    metadata = {
+        k: v for k, v in (collection.metadata or {}).items()
+        if not k.startswith("hnsw:")
+    }
+    collection.modify(metadata={**metadata, "files": files})
+    _repo_stats_cache.pop(repo_id, None)
+
+
 def query_chunks(
     repo_id: str,
-    query_embedding: list[float],
+    query_embedding: np.ndarray,
     top_k: int = 8,
+    in_memory: bool = True,
 ) -> list[dict]:
-    """Query ChromaDB for the most relevant chunks.
+    """Find the most relevant chunks for a query embedding.
+
+    The repo's embeddings are loaded into memory (int8-quantized) on first
+    query and ranked there with quantized_cosine_topk; repos too large for
+    the cache go through ChromaDB's HNSW index.
 
     Args:
         repo_id: UUID string identifying the repository.
-        query_embedding: Embedding vector for the user's question.
+        query_embedding: L2-normalized embedding of the user's question,
+            as returned by embed_texts.
         top_k: Number of top results to return (default 8).
+        in_memory: Use the in-memory index when possible (default True).
+            Pass False to always query ChromaDB's HNSW index.
 
     Returns:
         List of dicts sorted by relevance, each containing:
@@ -88,6 +165,17 @@ def query_chunks(
     """
     collection = _get_collection(repo_id)
 
+    index = _get_repo_index(repo_id, collection) if in_memory else None
+    if index is not None:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        rows, scores = quantized_cosine_topk(
+            query, index.codes, index.scales, top_k,
+        )
+        return [
+            _result_chunk(index.documents[i], index.metadatas[i], score)
+            for i, score in zip(rows.tolist(), scores.tolist())
+        ]
+
     results = collection.query(
         query_embeddings=[query_embedding],
         n_results=top_k,
@@ -102,51 +190,182 @@ def query_chunks(
 
     for doc, meta, distance in zip(documents, metadatas, distances):
         # ChromaDB cosine distance = 1 - cosine_similarity
-        score = 1.0 - distance
-        chunks.append({
-            "content": doc,
-            "filename": meta["filename"],
-            "start_line": meta["start_line"],
-            "end_line": meta["end_line"],
-            "language": meta["language"],
-            "score": round(score, 4),
-        })
+        chunks.append(_result_chunk(doc, meta, 1.0 - distance))
 
     return chunks
 
 
+def cosine_topk(
+    query: np.ndarray, matrix: np.ndarray, k: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return (row indices, scores) of the *k* rows most similar to *query*.
+
+    *query* and the rows of *matrix* must be L2-normalized, so one BLAS
+    matrix-vector product gives every cosine similarity. Results are
+    sorted best first.
+    """
+    return _top_k(matrix @ query, k)
+
+
+def quantized_cosine_topk(
+    query: np.ndarray, codes: np.ndarray, scales: np.ndarray, k: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Like cosine_topk, but against an int8 matrix from quantize_int8.
+
+    The query is quantized the same way; dot products accumulate in int32
+    and are rescaled by the row and query scales.
+    """
+    query_codes, query_scale = quantize_int8(query[np.newaxis])
+    dots = np.einsum("ij,j->i", codes, query_codes[0], dtype=np.int32)
+    return _top_k(dots * (scales * query_scale[0]), k)
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization.
+
+    Returns (codes, scales) with vectors ≈ codes * scales[:, None]; each
+    row's largest magnitude maps to ±127.
+    """
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0  # all-zero rows: any scale works
+    codes = np.round(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return (indices, scores) of the *k* highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=scores.dtype)
+
+    # O(N) selection of the top k, then sort just those k
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+def _get_repo_index(
+    repo_id: str, collection: chromadb.Collection,
+) -> _RepoIndex | None:
+    """Return the in-memory index for a repo, loading it on first use.
+
+    Returns None if the repo is empty or too large for MAX_CACHED_CHUNKS.
+    """
+    with _index_lock:
+        index = _index_cache.get(repo_id)
+        generation = _index_generation.get(repo_id, 0)
+    if index is not None:
+        return index
+
+    count = collection.count()
+    if not 0 < count <= MAX_CACHED_CHUNKS:
+        return None
+
+    codes: list[np.ndarray] = []
+    scales: list[np.ndarray] = []
+    documents: list[str] = []
+    metadatas: list[dict] = []
+    for offset in range(0, count, _INDEX_LOAD_PAGE_SIZE):
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=_INDEX_LOAD_PAGE_SIZE,
+            offset=offset,
+        )
+        # Stored vectors are already unit-norm (see embed_texts)
+        page_codes, page_scales = quantize_int8(
+            np.asarray(page["embeddings"], dtype=np.float32),
+        )
+        codes.append(page_codes)
+        scales.append(page_scales)
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+
+    index = _RepoIndex(
+        np.concatenate(codes), np.concatenate(scales), documents, metadatas,
+    )
+
+    with _index_lock:
+        # The collection changed while we were reading it: use this
+        # snapshot for the current query, but don't cache it
+        if _index_generation.get(repo_id, 0) != generation:
+            return index
+
+        # Evict the oldest repos until the new one fits
+        cached = sum(len(i.documents) for i in _index_cache.values())
+        while _index_cache and cached + count > MAX_CACHED_CHUNKS:
+            cached -= len(_index_cache.pop(next(iter(_index_cache))).documents)
+
+        _index_cache[repo_id] = index
+    return index
+
+
+def _invalidate_index(repo_id: str) -> None:
+    """Drop a repo's cached index and fence off loads already under way."""
+    with _index_lock:
+        _index_generation[repo_id] = _index_generation.get(repo_id, 0) + 1
+        _index_cache.pop(repo_id, None)
+
+
+def _result_chunk(doc: str, meta: dict, score: float) -> dict:
+    """Build a query_chunks result from a document, its metadata and score."""
+    return {
+        "content": doc,
+        "filename": meta["filename"],
+        "start_line": meta["start_line"],
+        "end_line": meta["end_line"],
+        "language": meta["language"],
+        "score": round(score, 4),
+    }
+
+
 def list_repos() -> list[dict]:
     """List all indexed repositories stored in ChromaDB.
 
+    Stats for fully indexed repos are cached in memory; stats for repos
+    without a recorded file count are recomputed on every call.
+
     Returns:
-        List of dicts with repo_id, name, chunks, indexed_at.
+        List of dicts with repo_id, name, files, chunks, indexed_at.
     """
     collections = _client.list_collections()
     repos: list[dict] = []
 
     for col in collections:
-        count = col.count()
-        # Peek at one document to grab the indexed_at timestamp
-        peek = col.peek(limit=1)
-        indexed_at = ""
-        if peek["metadatas"]:
-            indexed_at = peek["metadatas"][0].get("indexed_at", "")
-
-        # Collect unique filenames to report file count
-        all_meta = col.get(include=["metadatas"])
-        unique_files = {m["filename"] for m in all_meta["metadatas"]} if all_meta["metadatas"] else set()
-
-        repos.append({
-            "repo_id": col.name,
-            "name": col.name,
-            "files": len(unique_files),
-            "chunks": count,
-            "indexed_at": indexed_at,
-        })
+        stats = _repo_stats_cache.get(col.name)
+        if stats is None:
+            stats = _compute_repo_stats(col)
+            if "files" in (col.metadata or {}):
+                _repo_stats_cache[col.name] = stats
+        repos.append(dict(stats))
 
     return repos
 
 
+def _compute_repo_stats(col: chromadb.Collection) -> dict:
+    """Build a list_repos entry for one collection."""
+    count = col.count()
+    # Peek at one document to grab the indexed_at timestamp
+    peek = col.peek(limit=1)
+    indexed_at = ""
+    if peek["metadatas"]:
+        indexed_at = peek["metadatas"][0].get("indexed_at", "")
+
+    files = (col.metadata or {}).get("files")
+    if files is None:
+        # No recorded count (older or in-progress repo): collect unique
+        # filenames from every chunk
+        all_meta = col.get(include=["metadatas"])
+        files = len({m["filename"] for m in all_meta["metadatas"] or []})
+
+    return {
+        "repo_id": col.name,
+        "name": col.name,
+        "files": files,
+        "chunks": count,
+        "indexed_at": indexed_at,
+    }
+
+
 def delete_repo(repo_id: str) -> None:
     """Delete a repository's collection from ChromaDB.
 
@@ -154,4 +373,6 @@ def delete_repo(repo_id: str) -> None:
         repo_id: UUID string identifying the repository to remove.
     """
     _client.delete_collection(name=repo_id)
+    _repo_stats_cache.pop(repo_id, None)
+    _invalidate_index(repo_id)
     logger.info("Deleted collection for repo %s", repo_id)
@@ -1,11 +1,37 @@
 """Shared test fixtures."""
 
+import io
 import os
+import shutil
+import tarfile
+import tempfile
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
-from app.main import app
+
+# Temporary home for the app's on-disk data during the test session
+_APP_DATA_DIR: str | None = None
+
+
+def pytest_configure(config):
+    """Keep ChromaDB and the embedding cache out of the working tree.
+
+    Runs before any test module (and so app.config) is imported, so the
+    app's clients pick up these temporary paths.
+    """
+    global _APP_DATA_DIR
+    _APP_DATA_DIR = tempfile.mkdtemp(prefix="repopilot-test-")
+    os.environ["CHROMA_PERSIST_DIR"] = os.path.join(_APP_DATA_DIR, "chroma_data")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(
+        _APP_DATA_DIR, "embedding_cache.db",
+    )
+
+
+def pytest_unconfigure(config):
+    """Remove the directory created in pytest_configure."""
+    if _APP_DATA_DIR is not None:
+        shutil.rmtree(_APP_DATA_DIR, ignore_errors=True)
 
 
 # ---------------------------------------------------------------------------
@@ -15,6 +41,8 @@ from app.main import app
 @pytest.fixture
 async def client():
     """Async HTTP client for testing FastAPI endpoints."""
+    from app.main import app
+
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
@@ -43,32 +71,26 @@ module.exports = { greet };
 """
 
 
-def _make_large_py() -> str:
-    """Generate a Python file with 4 top-level functions, well over 80 lines."""
-    lines = ["import sys\n", "\n"]
-    for i in range(4):
-        lines.append(f"def func_{i}(x):\n")
-        for j in range(30):
-            lines.append(f"    line_{j} = {j}\n")
-        lines.append("\n")
-    return "".join(lines)
+# Python file with 4 top-level functions, well over 80 lines
+LARGE_PY = "import sys\n\n" + "".join(
+    f"def func_{i}(x):\n"
+    + "".join(f"    line_{j} = {j}\n" for j in range(30))
+    + "\n"
+    for i in range(4)
+)
 
+# JS file with 3 functions, well over 80 lines
+LARGE_JS = "// App module\n\n" + "".join(
+    f"function handler_{i}(req, res) {{\n"
+    + "".join(f"    const v{j} = {j};\n" for j in range(32))
+    + "}\n\n"
+    for i in range(3)
+)
 
-def _make_large_js() -> str:
-    """Generate a JS file with 3 functions, well over 80 lines."""
-    lines = ["// App module\n", "\n"]
-    for i in range(3):
-        lines.append(f"function handler_{i}(req, res) {{\n")
-        for j in range(32):
-            lines.append(f"    const v{j} = {j};\n")
-        lines.append("}\n")
-        lines.append("\n")
-    return "".join(lines)
 
-
-@pytest.fixture
-def fake_repo(tmp_path):
-    """Create a temporary directory that looks like a small code repository.
+@pytest.fixture(scope="session")
+def _fake_repo_tar(tmp_path_factory) -> bytes:
+    """Build the fake_repo tree once and return it as an in-memory tar.
 
     Structure:
         src/
@@ -82,7 +104,7 @@ def fake_repo(tmp_path):
         package-lock.json  (should be skipped)
         logo.png           (should be skipped — not in allowed extensions)
     """
-    repo = tmp_path / "fake-repo"
+    repo = tmp_path_factory.mktemp("template") / "fake-repo"
     repo.mkdir()
 
     # src/utils.py — small file
@@ -91,9 +113,7 @@ def fake_repo(tmp_path):
     (src / "utils.py").write_text(SMALL_PY)
 
     # src/engine.py — large Python file
-    engine_text = _make_large_py()
-    assert engine_text.count("\n") > 80
-    (src / "engine.py").write_text(engine_text)
+    (src / "engine.py").write_text(LARGE_PY)
 
     # lib/helpers.js — small file
     lib = repo / "lib"
@@ -101,9 +121,7 @@ def fake_repo(tmp_path):
     (lib / "helpers.js").write_text(SMALL_JS)
 
     # lib/app.js — large JS file
-    app_text = _make_large_js()
-    assert app_text.count("\n") > 80
-    (lib / "app.js").write_text(app_text)
+    (lib / "app.js").write_text(LARGE_JS)
 
     # node_modules — should be skipped entirely
     nm = repo / "node_modules" / "pkg"
@@ -116,4 +134,19 @@ def fake_repo(tmp_path):
     # Binary/image — not in allowed extensions, should be skipped
     (repo / "logo.png").write_bytes(b"\x89PNG fake")
 
-    return str(repo)
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        tar.add(repo, arcname=repo.name)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def fake_repo(tmp_path, _fake_repo_tar):
+    """Create a temporary directory that looks like a small code repository.
+
+    Each test gets its own copy, extracted from the session's tar (see
+    _fake_repo_tar for the layout).
+    """
+    with tarfile.open(fileobj=io.BytesIO(_fake_repo_tar)) as tar:
+        tar.extractall(tmp_path, filter="data")
+    return str(tmp_path / "fake-repo")
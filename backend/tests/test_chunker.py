@@ -1,13 +1,94 @@
 """Tests for the chunker service."""
 
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
 from app.services.chunker import (
     chunk_repository,
     SMALL_FILE_THRESHOLD,
     FALLBACK_CHUNK_LINES,
     FALLBACK_OVERLAP_LINES,
     MAX_CHUNK_CHARS,
+    SPLIT_PATTERNS,
+)
+
+# One huge Python function (200 lines × 50 chars), see
+# test_no_chunk_exceeds_max_chars
+BIG_PY_BYTES = (
+    "def mega_function():\n"
+    + "".join(f"    x_{i} = " + "a" * 40 + "\n" for i in range(200))
+).encode("utf-8")
+
+# Multi-language sources, each well over 80 lines, written so definitions
+# are preceded by blank lines, comments and K&R-style return types
+JAVA_SRC = (
+    "package demo;\n\nimport java.util.List;\n\n"
+    "public class Engine {\n\n"
+    "    public int evaluate(int depth) {\n        int score = 0;\n"
+    + "".join(f"        score += {i};\n" for i in range(25))
+    + "        return score;\n    }\n\n"
+    "    private static void reset(List<String> items) {\n"
+    + "".join(f"        items.add(\"v{i}\");\n" for i in range(25))
+    + "    }\n\n"
+    "    protected String name(String prefix) {\n"
+    + "".join(f"        prefix += \"{i}\";\n" for i in range(25))
+    + "        return prefix;\n    }\n}\n"
+)
+
+C_SRC = (
+    "/*\nCopyright 2024 Example Authors\nLicensed under the MIT License\n*/\n\n"
+    "#include <stdio.h>\n\n"
+    "static int\nhelper(int x)\n{\n    int total = x;\n"
+    + "".join(f"    total += {i};\n" for i in range(30))
+    + "    return total;\n}\n\n"
+    "struct point {\n    int x;\n    int y;\n};\n\n"
+    "int main(void)\n{\n"
+    + "".join(f"    printf(\"%d\\n\", helper({i}));\n" for i in range(30))
+    + "    return 0;\n}\n"
+)
+
+CPP_SRC = (
+    "// Licensed under the MIT License\n\n#include <vector>\n\n"
+    "namespace demo {\n\n"
+    "class Board {\npublic:\n    int size() const;\n};\n\n"
+    "int Board::size() const\n{\n    int n = 0;\n"
+    + "".join(f"    n += {i};\n" for i in range(30))
+    + "    return n;\n}\n\n"
+    "std::vector<int> moves(const Board& board)\n{\n"
+    "    std::vector<int> out;\n"
+    + "".join(f"    out.push_back({i});\n" for i in range(30))
+    + "    return out;\n}\n\n}  // namespace demo\n"
+)
+
+GO_SRC = (
+    "package main\n\nimport \"fmt\"\n\n"
+    "type Board struct {\n\tcells []int\n}\n\n"
+    "func (b *Board) Size() int {\n\tn := 0\n"
+    + "".join(f"\tn += {i}\n" for i in range(30))
+    + "\treturn n\n}\n\n"
+    "func main() {\n"
+    + "".join(f"\tfmt.Println({i})\n" for i in range(45))
+    + "}\n"
 )
 
+POLYGLOT_SOURCES = {
+    "Engine.java": JAVA_SRC,
+    "util.c": C_SRC,
+    "board.cpp": CPP_SRC,
+    "main.go": GO_SRC,
+}
+
+
+@pytest.fixture
+def polyglot_repo(tmp_path):
+    """Create a repository with one larger Java, C, C++ and Go file each."""
+    repo = tmp_path / "polyglot-repo"
+    repo.mkdir()
+    for filename, source in POLYGLOT_SOURCES.items():
+        (repo / filename).write_text(source)
+    return str(repo)
+
 
 def test_small_file_is_single_chunk(fake_repo):
     """Files under SMALL_FILE_THRESHOLD lines should produce exactly one chunk."""
@@ -126,11 +207,7 @@ def test_no_chunk_exceeds_max_chars(tmp_path):
     """The safety net should prevent any chunk from exceeding MAX_CHUNK_CHARS."""
     repo = tmp_path / "big-repo"
     repo.mkdir()
-    # Create a Python file with one huge function (200 lines × 50 chars)
-    lines = ["def mega_function():\n"]
-    for i in range(200):
-        lines.append(f"    x_{i} = " + "a" * 40 + "\n")
-    (repo / "big.py").write_text("".join(lines))
+    (repo / "big.py").write_bytes(BIG_PY_BYTES)
 
     chunks = chunk_repository(str(repo), "big-test")
 
@@ -139,3 +216,92 @@ def test_no_chunk_exceeds_max_chars(tmp_path):
             f"Chunk {chunk['chunk_id']} exceeds MAX_CHUNK_CHARS: "
             f"{len(chunk['content'])} > {MAX_CHUNK_CHARS}"
         )
+
+
+@pytest.mark.parametrize("repo_fixture", ["fake_repo", "polyglot_repo"])
+def test_split_matches_re_fallback(repo_fixture, request, monkeypatch):
+    """The Hyperscan scan should find exactly the same splits as the re fallback."""
+    import app.services.chunker as chunker
+
+    if not chunker.HYPERSCAN_DATABASES:
+        pytest.skip("hyperscan not installed")
+
+    repo = request.getfixturevalue(repo_fixture)
+    accelerated = chunk_repository(repo, "test-repo")
+    monkeypatch.setattr(chunker, "HYPERSCAN_DATABASES", {})
+    fallback = chunk_repository(repo, "test-repo")
+
+    key = lambda c: c["chunk_id"]
+    assert sorted(accelerated, key=key) == sorted(fallback, key=key)
+
+
+def _per_line_starts(text: str, language: str) -> list[int]:
+    """Chunk start lines from matching SPLIT_PATTERNS one line at a time."""
+    pattern = SPLIT_PATTERNS[language]
+    lines = text.splitlines(keepends=True)
+    starts = [i + 1 for i, line in enumerate(lines) if pattern.match(line)]
+    # Non-blank preamble before the first definition is its own chunk
+    if starts[0] > 1 and any(line.strip() for line in lines[: starts[0] - 1]):
+        starts.insert(0, 1)
+    return starts
+
+
+@pytest.mark.parametrize("filename", POLYGLOT_SOURCES)
+def test_splits_match_per_line_matching(polyglot_repo, monkeypatch, filename):
+    """Whole-file scanning should split on the same lines as matching each
+    line on its own — no match may start on one line and span the next."""
+    import app.services.chunker as chunker
+
+    monkeypatch.setattr(chunker, "HYPERSCAN_DATABASES", {})
+    chunks = [
+        c for c in chunk_repository(polyglot_repo, "test-repo")
+        if c["filename"] == filename
+    ]
+
+    expected = _per_line_starts(
+        POLYGLOT_SOURCES[filename], chunks[0]["language"],
+    )
+    assert len(expected) > 2
+    assert [c["start_line"] for c in chunks] == expected
+
+
+def test_long_whitespace_run_does_not_backtrack(tmp_path):
+    """Long runs of whitespace-only lines must not make the split patterns
+    backtrack catastrophically."""
+    repo = tmp_path / "ws-repo"
+    repo.mkdir()
+    (repo / "A.java").write_text("public class A {\n" + "    \n" * 5000 + "}\n")
+    # Long line placed after the first three, which the minified check reads
+    (repo / "a.c").write_text(
+        "int x;\n" * 3 + "x" + " " * 20_000 + "\n" * 100,
+    )
+
+    chunks = chunk_repository(str(repo), "ws-test")
+
+    assert {c["filename"] for c in chunks} == {"A.java", "a.c"}
+
+
+def test_process_pool_matches_sequential(fake_repo, monkeypatch):
+    """Chunking across the process pool should give the same chunks in the same order."""
+    import app.services.chunker as chunker
+
+    sequential = chunk_repository(fake_repo, "test-repo")
+    monkeypatch.setattr(chunker, "PARALLEL_MIN_FILES", 0)
+
+    # Without a pool, files are still chunked in-process
+    assert chunk_repository(fake_repo, "test-repo") == sequential
+
+    with ProcessPoolExecutor(
+        max_workers=2, mp_context=chunker.POOL_CONTEXT,
+    ) as pool:
+        assert chunk_repository(fake_repo, "test-repo", pool=pool) == sequential
+
+
+def test_streaming_batches_match_full_result(fake_repo):
+    """Concatenated streaming batches should equal chunk_repository's output."""
+    from app.services.chunker import chunk_repository_streaming
+
+    batches = list(chunk_repository_streaming(fake_repo, "test-repo", batch_size=2))
+
+    assert len(batches) > 1
+    assert [c for b in batches for c in b] == chunk_repository(fake_repo, "test-repo")
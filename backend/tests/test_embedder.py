@@ -1,6 +1,10 @@
 """Tests for the embedder service."""
 
-from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
 
 from app.services.embedder import (
     embed_texts,
@@ -11,9 +15,9 @@ from app.services.embedder import (
 
 
 async def test_empty_input_returns_empty():
-    """embed_texts([]) should return [] without calling the API."""
+    """embed_texts([]) should return an empty array without calling the API."""
     result = await embed_texts([])
-    assert result == []
+    assert len(result) == 0
 
 
 async def test_truncate_oversized_leaves_short_texts():
@@ -35,13 +39,10 @@ async def test_single_batch_calls_api_once():
     """A small number of texts should result in exactly one API call."""
     fake_embedding = [0.1] * 1536
 
-    # Build a mock response object that matches OpenAI's structure
-    mock_item = MagicMock()
-    mock_item.index = 0
-    mock_item.embedding = fake_embedding
-
-    mock_response = MagicMock()
-    mock_response.data = [mock_item]
+    # Build a response object that matches OpenAI's structure
+    mock_response = SimpleNamespace(data=[
+        SimpleNamespace(index=0, embedding=fake_embedding),
+    ])
 
     mock_create = AsyncMock(return_value=mock_response)
 
@@ -50,55 +51,69 @@ async def test_single_batch_calls_api_once():
 
         result = await embed_texts(["hello"])
 
-    assert len(result) == 1
-    assert result[0] == fake_embedding
+    assert result.shape == (1, 1536)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result[0], 1 / np.sqrt(1536), rtol=1e-6)
     mock_create.assert_awaited_once()
 
 
 async def test_batching_splits_large_inputs():
     """Inputs larger than MAX_BATCH_SIZE should be split into multiple API calls."""
     fake_embedding = [0.1] * 1536
-    num_texts = MAX_BATCH_SIZE + 100  # triggers 2 batches
+    tail = 37
+    num_texts = MAX_BATCH_SIZE + tail  # one full batch and a short one
 
-    def make_response(texts):
-        items = []
-        for i in range(len(texts)):
-            item = MagicMock()
-            item.index = i
-            item.embedding = fake_embedding
-            items.append(item)
-        resp = MagicMock()
-        resp.data = items
-        return resp
+    def make_response(size):
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=fake_embedding)
+            for i in range(size)
+        ])
 
-    mock_create = AsyncMock(side_effect=lambda **kwargs: make_response(kwargs["input"]))
+    # Both batches share the same embeddings, so build each response once
+    resp_full = make_response(MAX_BATCH_SIZE)
+    resp_tail = make_response(tail)
+
+    mock_create = AsyncMock(side_effect=lambda **kwargs: (
+        resp_full if len(kwargs["input"]) == MAX_BATCH_SIZE else resp_tail
+    ))
 
     with patch("app.services.embedder._client") as mock_client:
         mock_client.embeddings.create = mock_create
 
         result = await embed_texts(["text"] * num_texts)
 
-    assert len(result) == num_texts
-    assert mock_create.await_count == 2  # 2048 + 100 = 2 batches
+    assert result.shape == (num_texts, 1536)
+    assert [len(c.kwargs["input"]) for c in mock_create.await_args_list] == [
+        MAX_BATCH_SIZE, tail,
+    ]
+
+
+async def test_embeddings_are_unit_normalized():
+    """Returned rows should have unit L2 norm so cosine is a dot product."""
+    response = SimpleNamespace(data=[
+        SimpleNamespace(index=0, embedding=[3.0, 4.0]),
+        SimpleNamespace(index=1, embedding=[0.0, 0.5]),
+    ])
+
+    with patch("app.services.embedder._client") as mock_client:
+        mock_client.embeddings.create = AsyncMock(return_value=response)
+
+        result = await embed_texts(["a", "b"])
+
+    np.testing.assert_allclose(result, [[0.6, 0.8], [0.0, 1.0]], rtol=1e-6)
 
 
 async def test_result_order_preserved():
     """Embeddings should be returned in the same order as input texts,
     even if the API returns them out of order."""
-    emb_a = [1.0] * 10
-    emb_b = [2.0] * 10
+    emb_a = [1.0] + [0.0] * 9
+    emb_b = [0.0, 1.0] + [0.0] * 8
 
     # Simulate API returning items out of order
-    item_b = MagicMock()
-    item_b.index = 1
-    item_b.embedding = emb_b
-
-    item_a = MagicMock()
-    item_a.index = 0
-    item_a.embedding = emb_a
-
-    mock_response = MagicMock()
-    mock_response.data = [item_b, item_a]  # reversed order
+    mock_response = SimpleNamespace(data=[
+        SimpleNamespace(index=1, embedding=emb_b),
+        SimpleNamespace(index=0, embedding=emb_a),
+    ])  # reversed order
 
     mock_create = AsyncMock(return_value=mock_response)
 
@@ -107,5 +122,61 @@ async def test_result_order_preserved():
 
         result = await embed_texts(["text_a", "text_b"])
 
-    assert result[0] == emb_a
-    assert result[1] == emb_b
+    np.testing.assert_array_equal(result[0], emb_a)
+    np.testing.assert_array_equal(result[1], emb_b)
+
+
+async def test_batches_sent_concurrently():
+    """Batches should be in flight at the same time, not awaited one by one."""
+    in_flight = 0
+    peak = 0
+
+    async def fake_create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[0.1] * 4)
+            for i in range(len(kwargs["input"]))
+        ])
+
+    with patch("app.services.embedder._client") as mock_client:
+        mock_client.embeddings.create = fake_create
+
+        result = await embed_texts(["text"] * (MAX_BATCH_SIZE * 3))
+        assert peak == 3
+
+    assert result.shape == (MAX_BATCH_SIZE * 3, 4)
+
+
+async def test_semaphore_caps_batches_across_calls(monkeypatch):
+    """A semaphore — passed in, or the loop-wide default — should bound
+    in-flight batches across concurrent embed_texts calls, not per call."""
+    in_flight = 0
+    peak = 0
+
+    async def fake_create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[0.1] * 4)
+            for i in range(len(kwargs["input"]))
+        ])
+
+    texts = ["text"] * (MAX_BATCH_SIZE * 3)  # 3 batches per call
+    with patch("app.services.embedder._client") as mock_client:
+        mock_client.embeddings.create = fake_create
+
+        semaphore = asyncio.Semaphore(8)
+        await asyncio.gather(*(embed_texts(texts, semaphore) for _ in range(4)))
+        assert peak == 8
+
+        peak = 0
+        monkeypatch.setattr("app.services.embedder.MAX_CONNECTIONS", 5)
+        await asyncio.gather(*(embed_texts(texts) for _ in range(4)))
+        assert peak == 5
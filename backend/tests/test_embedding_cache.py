@@ -0,0 +1,78 @@
+"""Tests for the embedding cache service."""
+
+import numpy as np
+import pytest
+
+from app.services.embedding_cache import (
+    content_hash,
+    get_embeddings,
+    put_embeddings,
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    """Point the cache at a fresh database for every test."""
+    path = str(tmp_path / "embedding_cache.db")
+    monkeypatch.setattr("app.services.embedding_cache.EMBEDDING_CACHE_PATH", path)
+    return path
+
+
+def test_content_hash_is_stable():
+    """Equal text should hash equal; different text should not."""
+    assert content_hash("def a(): pass") == content_hash("def a(): pass")
+    assert content_hash("def a(): pass") != content_hash("def b(): pass")
+
+
+def test_round_trip():
+    """Stored embeddings should come back for the same hashes and model."""
+    keys = [content_hash("a"), content_hash("b")]
+    put_embeddings(keys, np.float32([[0.5, 0.25], [1.0, -1.0]]), "model-x")
+
+    found = get_embeddings(keys, "model-x")
+    assert {k: v.tolist() for k, v in found.items()} == {
+        keys[0]: [0.5, 0.25],
+        keys[1]: [1.0, -1.0],
+    }
+    assert found[keys[0]].dtype == np.float32
+
+
+def test_misses_are_absent():
+    """Hashes never stored should not appear in the result."""
+    put_embeddings([content_hash("a")], np.float32([[0.5]]), "model-x")
+
+    found = get_embeddings([content_hash("a"), content_hash("missing")], "model-x")
+    assert list(found) == [content_hash("a")]
+
+
+def test_model_isolation():
+    """Vectors from one model must not be served for another."""
+    put_embeddings([content_hash("a")], np.float32([[0.5]]), "model-x")
+
+    assert get_embeddings([content_hash("a")], "model-y") == {}
+
+
+async def test_upload_reuses_cached_embeddings(monkeypatch):
+    """Only texts missing from the cache should be sent to embed_texts."""
+    from app.routers.upload import _embed_with_cache
+
+    put_embeddings(
+        [content_hash("seen")], np.float32([[0.5, 0.5]]), "text-embedding-3-small",
+    )
+
+    calls: list[list[str]] = []
+
+    async def mock_embed(texts):
+        calls.append(texts)
+        return np.float32([[1.0, 0.0] for _ in texts])
+
+    monkeypatch.setattr("app.routers.upload.embed_texts", mock_embed)
+
+    result = await _embed_with_cache(["seen", "new"])
+    assert result.tolist() == [[0.5, 0.5], [1.0, 0.0]]
+    assert calls == [["new"]]
+
+    # Second run: everything is cached, no API call
+    result = await _embed_with_cache(["seen", "new"])
+    assert result.tolist() == [[0.5, 0.5], [1.0, 0.0]]
+    assert len(calls) == 1
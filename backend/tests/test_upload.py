@@ -20,7 +20,7 @@ async def test_upload_missing_field(client):
     assert res.status_code == 422
 
 
-async def test_upload_response_schema(client, monkeypatch):
+async def test_upload_response_schema(client, monkeypatch, tmp_path):
     """POST /api/upload with valid input should return the correct response shape."""
     # Mock clone_repo to return a temp dir with a small file
     import tempfile, os
@@ -43,6 +43,10 @@ async def test_upload_response_schema(client, monkeypatch):
     monkeypatch.setattr("app.routers.upload.clone_repo", mock_clone)
     monkeypatch.setattr("app.routers.upload.cleanup_repo", mock_cleanup)
     monkeypatch.setattr("app.routers.upload.embed_texts", mock_embed)
+    monkeypatch.setattr(
+        "app.services.embedding_cache.EMBEDDING_CACHE_PATH",
+        str(tmp_path / "embedding_cache.db"),
+    )
 
     res = await client.post(
         "/api/upload", json={"github_url": "https://github.com/user/test-repo"}
@@ -56,9 +60,63 @@ async def test_upload_response_schema(client, monkeypatch):
     assert data["chunks_created"] >= 1
     assert "repo_id" in data
 
+    # The file count should be recorded for /api/repos
+    from app.services.vectorstore import delete_repo, list_repos
+    listed = next(r for r in list_repos() if r["repo_id"] == data["repo_id"])
+    assert listed["files"] == data["files_processed"]
+    assert listed["chunks"] == data["chunks_created"]
+
     # Clean up the ChromaDB collection
-    from app.services.vectorstore import delete_repo
     delete_repo(data["repo_id"])
+    assert all(r["repo_id"] != data["repo_id"] for r in list_repos())
 
     import shutil
     shutil.rmtree(tmp, ignore_errors=True)
+
+
+async def test_upload_embed_failure_cleans_up(client, monkeypatch, tmp_path):
+    """If embedding fails mid-pipeline, return 502 and leave no partial collection."""
+    from app.services.chunker import chunk_repository
+
+    repo_dir = tmp_path / "fail-repo"
+    repo_dir.mkdir()
+    for i in range(3):
+        (repo_dir / f"mod_{i}.py").write_text(f"def f_{i}():\n    return {i}\n")
+
+    async def mock_clone(url):
+        return str(repo_dir)
+
+    calls = 0
+
+    async def flaky_embed(texts):
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise RuntimeError("OpenAI API error: boom")
+        return [[0.1] * 1536 for _ in texts]
+
+    stored: list[str] = []
+
+    monkeypatch.setattr("app.routers.upload.clone_repo", mock_clone)
+    monkeypatch.setattr("app.routers.upload.cleanup_repo", lambda path: None)
+    monkeypatch.setattr("app.routers.upload.embed_texts", flaky_embed)
+    monkeypatch.setattr("app.routers.upload.EMBED_WORKERS", 1)
+    # One chunk per batch so the failure lands after the first store
+    monkeypatch.setattr(
+        "app.routers.upload.chunk_repository_streaming",
+        lambda path, repo_id, pool: iter(
+            [[c] for c in chunk_repository(path, repo_id)],
+        ),
+    )
+    monkeypatch.setattr(
+        "app.services.embedding_cache.EMBEDDING_CACHE_PATH",
+        str(tmp_path / "embedding_cache.db"),
+    )
+
+    res = await client.post(
+        "/api/upload", json={"github_url": "https://github.com/user/fail-repo"}
+    )
+    assert res.status_code == 502
+
+    from app.services.vectorstore import list_repos
+    assert not any(r["repo_id"].startswith("fail-repo-") for r in list_repos())
@@ -0,0 +1,166 @@
+"""Tests for the vector store service."""
+
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services import vectorstore
+from app.services.vectorstore import (
+    cosine_topk,
+    delete_repo,
+    quantize_int8,
+    quantized_cosine_topk,
+    query_chunks,
+    store_chunks,
+)
+
+
+@pytest.fixture
+def stored_repo():
+    """Store a few chunks with known embeddings in a throwaway collection."""
+    repo_id = f"test-vs-{uuid.uuid4().hex[:8]}"
+    embeddings = np.float32([
+        [1.0, 0.0, 0.0],
+        [0.6, 0.8, 0.0],
+        [0.0, 0.0, 1.0],
+    ])
+    chunks = [
+        {
+            "content": f"chunk {i}",
+            "filename": f"f{i}.py",
+            "start_line": 1,
+            "end_line": 1,
+            "language": "python",
+            "chunk_id": f"{repo_id}:f{i}.py:1",
+        }
+        for i in range(len(embeddings))
+    ]
+    store_chunks(repo_id, chunks, embeddings)
+    yield repo_id
+    delete_repo(repo_id)
+
+
+def test_cosine_topk_orders_best_first():
+    """cosine_topk should return the k highest-scoring rows, best first."""
+    matrix = np.float32([[1, 0], [0, 1], [0.8, 0.6], [-1, 0]])
+    rows, scores = cosine_topk(np.float32([1, 0]), matrix, 3)
+
+    assert rows.tolist() == [0, 2, 1]
+    np.testing.assert_allclose(scores, [1.0, 0.8, 0.0])
+
+
+def test_cosine_topk_k_larger_than_rows():
+    """Asking for more rows than exist should return all of them."""
+    matrix = np.float32([[1, 0], [0, 1]])
+    rows, _ = cosine_topk(np.float32([0, 1]), matrix, 8)
+
+    assert rows.tolist() == [1, 0]
+
+
+def test_quantize_int8_round_trip():
+    """Dequantized rows should be within half a quantization step."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((16, 64)).astype(np.float32)
+    vectors[3] = 0.0
+
+    codes, scales = quantize_int8(vectors)
+
+    assert codes.dtype == np.int8
+    assert np.abs(codes).max() == 127
+    error = np.abs(codes * scales[:, None] - vectors)
+    assert np.all(error <= scales[:, None] / 2 + 1e-6)
+
+
+def test_quantized_topk_matches_float():
+    """int8 scoring should rank well-separated rows the same as float32."""
+    rng = np.random.default_rng(1)
+    matrix = rng.standard_normal((200, 64)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    query = matrix[17] + 0.1 * matrix[42]
+    query /= np.linalg.norm(query)
+
+    codes, scales = quantize_int8(matrix)
+    rows, scores = quantized_cosine_topk(query, codes, scales, 2)
+    expected_rows, expected_scores = cosine_topk(query, matrix, 2)
+
+    assert rows.tolist() == expected_rows.tolist()
+    np.testing.assert_allclose(scores, expected_scores, atol=2e-2)
+
+
+def test_cached_query_matches_chroma(stored_repo, monkeypatch):
+    """The in-memory int8 path should rank like ChromaDB and score within
+    quantization error."""
+    query = np.float32([0.8, 0.6, 0.0])
+
+    # Load the index over more than one page
+    monkeypatch.setattr(vectorstore, "_INDEX_LOAD_PAGE_SIZE", 2)
+    cached = query_chunks(stored_repo, query, top_k=2)
+    assert stored_repo in vectorstore._index_cache
+
+    monkeypatch.setattr(vectorstore, "MAX_CACHED_CHUNKS", 0)
+    vectorstore._index_cache.clear()
+    chroma = query_chunks(stored_repo, query, top_k=2)
+
+    assert [c["filename"] for c in cached] == ["f1.py", "f0.py"]
+    assert [c["filename"] for c in cached] == [c["filename"] for c in chroma]
+    for a, b in zip(cached, chroma):
+        assert a["score"] == pytest.approx(b["score"], abs=1e-2)
+
+
+def test_query_without_in_memory_index(stored_repo):
+    """in_memory=False should query ChromaDB without loading the index."""
+    results = query_chunks(
+        stored_repo, np.float32([0.0, 0.0, 1.0]), top_k=1, in_memory=False,
+    )
+
+    assert [c["filename"] for c in results] == ["f2.py"]
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert stored_repo not in vectorstore._index_cache
+
+
+def test_store_invalidates_cached_index(stored_repo):
+    """Storing more chunks should drop the repo's in-memory index."""
+    query_chunks(stored_repo, np.float32([1.0, 0.0, 0.0]), top_k=1)
+    assert stored_repo in vectorstore._index_cache
+
+    store_chunks(stored_repo, [{
+        "content": "extra",
+        "filename": "extra.py",
+        "start_line": 1,
+        "end_line": 1,
+        "language": "python",
+        "chunk_id": f"{stored_repo}:extra.py:1",
+    }], np.float32([[0.0, 1.0, 0.0]]))
+
+    assert stored_repo not in vectorstore._index_cache
+
+
+def test_index_load_overlapping_store_is_not_cached(stored_repo, monkeypatch):
+    """An index load that overlaps store_chunks must not cache stale data."""
+    quantize = vectorstore.quantize_int8
+    extra = {
+        "content": "extra",
+        "filename": "extra.py",
+        "start_line": 1,
+        "end_line": 1,
+        "language": "python",
+        "chunk_id": f"{stored_repo}:extra.py:1",
+    }
+
+    def quantize_during_store(vectors):
+        # Simulate store_chunks finishing while the index is being read
+        monkeypatch.setattr(vectorstore, "quantize_int8", quantize)
+        store_chunks(stored_repo, [extra], np.float32([[0.0, 1.0, 0.0]]))
+        return quantize(vectors)
+
+    monkeypatch.setattr(vectorstore, "quantize_int8", quantize_during_store)
+    results = query_chunks(stored_repo, np.float32([1.0, 0.0, 0.0]), top_k=1)
+
+    assert [c["filename"] for c in results] == ["f0.py"]
+    assert stored_repo not in vectorstore._index_cache
+
+    # The next query loads (and caches) the updated collection
+    results = query_chunks(stored_repo, np.float32([0.0, 1.0, 0.0]), top_k=1)
+    assert [c["filename"] for c in results] == ["extra.py"]
+    assert stored_repo in vectorstore._index_cache